@@ -0,0 +1,291 @@
+"""In-process EDA for uploaded CSVs.
+
+This used to live inside robust_server.py as a generated script that was
+written to disk and executed in a subprocess. The work is fixed (standard
+charts over the first numeric/categorical columns), so it runs as a plain
+function call instead: no codegen, no agent round-trip, no subprocess IPC.
+The module still works standalone: python eda.py <csv> <output_dir>.
+"""
+
+import io
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import seaborn as sns
+from matplotlib import cbook
+
+from obd2_analysis import write_batch
+
+try:
+    from numba import njit
+    _HAS_NUMBA = True
+except ImportError:
+    _HAS_NUMBA = False
+
+
+def row_kernel(func):
+    """JIT-compile a per-row kernel when numba is installed.
+
+    The built-in charts are pure vector ops, but custom analysis types can
+    need genuinely row-wise loops, which are ~100x slower through df.apply
+    than through a compiled kernel. Decorated functions must accept plain
+    ndarrays (use .to_numpy()), not DataFrames; without numba the function
+    runs undecorated as ordinary Python.
+    """
+    if _HAS_NUMBA:
+        return njit(parallel=True, fastmath=True)(func)
+    return func
+
+
+def _png(fig, **save_kw):
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', **save_kw)
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def plot_distributions(numeric_df, num_cols):
+    if not len(num_cols):
+        return None
+    # One figure for the whole group: figure setup, tick layout and PNG
+    # encoding happen once instead of once per column.
+    fig, axes = plt.subplots(len(num_cols), 1, figsize=(10, 6 * len(num_cols)))
+    for ax, col in zip(np.atleast_1d(axes), num_cols):
+        values = numeric_df[col].dropna()
+        # Exact counts from a fixed-bin histogram; the KDE overlay runs on a
+        # bounded sample so huge columns cannot blow up seaborn's KDE path.
+        counts, edges = np.histogram(values.to_numpy(), bins=50)
+        ax.stairs(counts, edges, fill=True)
+        kde_sample = values.sample(200_000, random_state=0) if len(values) > 200_000 else values
+        sns.kdeplot(kde_sample, ax=ax.twinx())
+        ax.set_title(f"Distribution of {col}")
+    fig.tight_layout()
+    return ("distributions.png", _png(fig))
+
+
+def _tiled_corr(arr, block=512):
+    # Standardize once, then build the correlation matrix as block GEMMs:
+    # float32 halves bandwidth and the tiling bounds temporaries to
+    # block x C instead of materializing corrcoef's full working set.
+    X = arr.astype(np.float32)
+    X -= X.mean(0)
+    X /= X.std(0, ddof=1) + 1e-12
+    n_cols = X.shape[1]
+    C = np.empty((n_cols, n_cols), dtype=np.float32)
+    denom = max(X.shape[0] - 1, 1)
+    for i in range(0, n_cols, block):
+        Xi = X[:, i:i + block]
+        for j in range(0, n_cols, block):
+            C[i:i + block, j:j + block] = Xi.T @ X[:, j:j + block] / denom
+    return C
+
+
+def plot_corr(numeric_df):
+    # np.corrcoef is one BLAS GEMM over contiguous memory; DataFrame.corr
+    # walks column pairs in Python and is far slower.
+    arr = numeric_df.to_numpy(dtype=np.float64, copy=False)
+    arr = arr[~np.isnan(arr).any(axis=1)]
+    if not arr.size:
+        # No numeric columns, or every row had a NaN: nothing to correlate.
+        return None
+    cm = None
+    if arr.shape[1] > 512:
+        # Very wide frames: corrcoef's O(C^2) float64 workspace can blow
+        # memory, so fall to the tiled float32 path.
+        cm = _tiled_corr(arr)
+    elif arr.size > 1_000_000:
+        # Big numeric blocks: same GEMM on the GPU if CuPy is around. float32
+        # halves the host-to-device transfer; below the gate the copy would
+        # cost more than the compute saves.
+        try:
+            import cupy as cp
+            cm = cp.asnumpy(cp.corrcoef(cp.asarray(arr, dtype=cp.float32), rowvar=False))
+        except ImportError:
+            pass
+    if cm is None:
+        cm = np.corrcoef(arr, rowvar=False)
+    corr_matrix = pd.DataFrame(cm, index=numeric_df.columns, columns=numeric_df.columns)
+
+    fig = plt.figure(figsize=(12, 10))
+    # Per-cell annotations are one Text artist each; skip them past 15x15 so
+    # layout stays O(1). Rasterizing the mesh writes a single raster block
+    # into the PNG instead of one quad per cell.
+    ax = sns.heatmap(corr_matrix, annot=corr_matrix.shape[0] <= 15, cmap='coolwarm', fmt=".2f")
+    for c in ax.collections:
+        c.set_rasterized(True)
+    plt.title("Correlation Matrix")
+    return ("correlation_heatmap.png", _png(fig, bbox_inches='tight', dpi=100))
+
+
+def plot_box(numeric_df):
+    if not len(numeric_df.columns):
+        return None
+    # Z-score the columns so different scales share one axis. pd.eval fuses
+    # the whole expression through numexpr (threaded, no intermediate
+    # frames) when it is installed.
+    normalized = pd.eval(
+        "(numeric_df - numeric_df.mean()) / numeric_df.std()",
+        local_dict={'numeric_df': numeric_df},
+    )
+    # boxplot_stats computes quartiles/whiskers/outliers straight from the
+    # ndarray and ax.bxp just draws them, skipping pandas' per-Series
+    # boxplot wrapper.
+    arr = normalized.to_numpy(dtype=np.float64)
+    columns, labels = [], []
+    for i, name in enumerate(numeric_df.columns):
+        col = arr[~np.isnan(arr[:, i]), i]
+        if col.size:
+            columns.append(col)
+            labels.append(name)
+    if not columns:
+        return None
+    stats = cbook.boxplot_stats(columns, labels=labels)
+    fig, ax = plt.subplots(figsize=(14, 8))
+    ax.bxp(stats, showfliers=True)
+    ax.tick_params(axis='x', rotation=90)
+    ax.set_title("Numeric Column Boxplots (z-scored)")
+    fig.tight_layout()
+    return ("boxplots.png", _png(fig))
+
+
+def plot_pair(numeric_df, num_cols):
+    # Pairwise relationships. pairplot draws one marker per point per panel;
+    # hexbin aggregates each panel into a 2D histogram, so cost stays O(N)
+    # per panel instead of O(N) artists.
+    if len(num_cols) < 2:
+        return None
+    k = len(num_cols)
+    fig, axes = plt.subplots(k, k, figsize=(2.5 * k, 2.5 * k))
+    for i, ci in enumerate(num_cols):
+        for j, cj in enumerate(num_cols):
+            ax = axes[i, j]
+            if i == j:
+                ax.hist(numeric_df[ci].dropna(), bins=30)
+            else:
+                ax.hexbin(numeric_df[cj], numeric_df[ci], gridsize=40, rasterized=True)
+            if i == k - 1:
+                ax.set_xlabel(cj)
+            if j == 0:
+                ax.set_ylabel(ci)
+    return ("pairplot.png", _png(fig))
+
+
+def plot_counts(cat_df, cat_cols):
+    if not len(cat_cols):
+        return None
+    fig, axes = plt.subplots(len(cat_cols), 1, figsize=(10, 6 * len(cat_cols)))
+    for ax, col in zip(np.atleast_1d(axes), cat_cols):
+        # value_counts().head(20) sorts every unique value (O(U log U));
+        # argpartition picks the top 20 in O(U) and only sorts those.
+        vals, counts = np.unique(cat_df[col].dropna().to_numpy(), return_counts=True)
+        if counts.size > 20:
+            idx = np.argpartition(counts, -20)[-20:]
+            vals, counts = vals[idx], counts[idx]
+        order = np.argsort(-counts)
+        ax.bar([str(v) for v in vals[order]], counts[order])
+        ax.tick_params(axis='x', rotation=90)
+        ax.set_title(f"Value Counts for {col}")
+    fig.tight_layout()
+    return ("value_counts.png", _png(fig))
+
+
+def _flush_pngs(output_dir, results):
+    # One batched pass over the rendered buffers: write_batch submits the
+    # whole set through io_uring when the liburing bindings are installed
+    # and falls back to a plain open/write/close loop otherwise.
+    write_batch([(os.path.join(output_dir, name), data) for name, data in results])
+
+
+def _read_csv(file_path):
+    # The arrow engine parses in parallel and is far faster than the default
+    # C engine; fall back when pyarrow is missing or the file trips one of
+    # arrow's stricter parse paths.
+    try:
+        df = pd.read_csv(file_path, engine='pyarrow')
+    except (ImportError, ValueError):
+        df = pd.read_csv(file_path)
+    # Downcast numerics and dictionary-encode low-cardinality strings:
+    # narrower columns halve the bandwidth every downstream pass pays.
+    for c in df.select_dtypes('integer').columns:
+        df[c] = pd.to_numeric(df[c], downcast='integer')
+    for c in df.select_dtypes('float').columns:
+        df[c] = pd.to_numeric(df[c], downcast='float')
+    for c in df.select_dtypes('object').columns:
+        if df[c].nunique() < len(df) * 0.5:
+            df[c] = df[c].astype('category')
+    return df
+
+
+def perform_eda(file_path: str, output_dir: str, derive: dict = None,
+                progress_cb=None) -> list:
+    """Run the standard EDA over a CSV; returns visualization metadata.
+
+    derive maps new column names to pandas expressions (e.g.
+    {"ratio": "df.a / df.b"}); each is evaluated through pd.eval, which
+    routes elementwise arithmetic to numexpr when available. progress_cb,
+    when given, is called with the encoded size of each chart as it
+    finishes (it may be invoked from a worker-pool callback thread).
+    """
+    df = _read_csv(file_path)
+
+    for new_col, expr in (derive or {}).items():
+        df[new_col] = pd.eval(expr, local_dict={'df': df})
+
+    # Dtype partitioning is inferred once at read time and carried through
+    # the rest of the pipeline; nothing downstream re-scans dtypes.
+    schema = {
+        'numeric': df.select_dtypes(include=np.number).columns.tolist(),
+        'categorical': df.select_dtypes(include=['object', 'category']).columns.tolist(),
+    }
+    numeric_df = df[schema['numeric']]
+    cat_df = df[schema['categorical']]
+    num_cols = schema['numeric'][:5]
+    cat_cols = schema['categorical'][:5]
+
+    # Each chart renders in its own worker: matplotlib holds the GIL while
+    # drawing, so data-parallel figures only overlap across processes. Only
+    # the slice each plot needs is pickled to its worker.
+    with ProcessPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as pool:
+        futures = [
+            pool.submit(plot_distributions, numeric_df[num_cols], num_cols),
+            pool.submit(plot_corr, numeric_df),
+            pool.submit(plot_box, numeric_df),
+            pool.submit(plot_pair, numeric_df[num_cols], num_cols),
+            pool.submit(plot_counts, cat_df[cat_cols], cat_cols),
+        ]
+        results = []
+        for f in as_completed(futures):
+            r = f.result()
+            if r is None:
+                continue
+            results.append(r)
+            if progress_cb is not None:
+                progress_cb(len(r[1]))
+
+    _flush_pngs(output_dir, results)
+
+    # Summary report
+    report_lines = ["# Automated EDA Report", ""]
+    report_lines.append(f"- Rows: {len(df)}")
+    report_lines.append(f"- Columns: {len(df.columns)}")
+    report_lines.append("")
+    report_lines.append("## Summary statistics")
+    report_lines.append(df.describe().to_string())
+    with open(os.path.join(output_dir, "summary_report.md"), "w", encoding="utf-8") as f:
+        f.write("\n".join(report_lines))
+
+    return [
+        {"filename": name, "description": name.rsplit(".", 1)[0].replace("_", " ")}
+        for name, _data in results
+    ]
+
+
+if __name__ == "__main__":
+    entries = perform_eda(sys.argv[1], sys.argv[2])
+    print(f"Wrote {len(entries)} charts")
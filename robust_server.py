@@ -0,0 +1,1075 @@
+"""
+Robust analysis server for the AiAutoshop backend.
+
+Serves the research/analysis WebSocket protocol used by
+services/pythonExecutionService.js and the analysis dashboard:
+
+- /ws and /research-ws   WebSocket endpoints (client_id query param)
+- /upload, /analysis     CSV upload + background EDA
+- /visualizations/...    generated chart retrieval
+- /research/results/...  completed research retrieval
+
+Run directly:  python3 robust_server.py   (listens on :8000)
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import traceback
+import uuid
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+import aiofiles
+import orjson
+from fastapi import FastAPI, File, Form, Query, Request, Response, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse
+from starlette.websockets import WebSocketState
+
+# Data-analysis stack probed once at import; run_analysis checks the flags.
+try:
+    import pandas as _pd
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as _plt  # noqa: F401
+    import seaborn as _sns  # noqa: F401
+    import numpy as _np  # noqa: F401
+    from eda import perform_eda
+    _DA_AVAILABLE = True
+    _DA_ERROR = None
+except ImportError as e:
+    _DA_AVAILABLE = False
+    _DA_ERROR = str(e)
+
+try:
+    from watchfiles import Change, awatch
+    _HAS_WATCHFILES = True
+except ImportError:  # fall back to directory polling
+    _HAS_WATCHFILES = False
+
+try:
+    import simdjson
+    _sj_parser = simdjson.Parser()
+except ImportError:  # SIMD parsing is optional; orjson covers the slow path
+    simdjson = None
+    _sj_parser = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("robust_server")
+
+app = FastAPI(title="AiAutoshop Analysis Server")
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Connection / job bookkeeping -------------------------------------------------
+
+# Weak values: entries disappear when a WebSocket object is collected, so an
+# exception escaping before teardown cannot leak the connection entry.
+active_connections: "weakref.WeakValueDictionary[str, WebSocket]" = weakref.WeakValueDictionary()
+websocket_tasks: Dict[str, Set[asyncio.Task]] = {}
+
+
+class _TTLCache:
+    """Tiny TTL + LRU map for completed job results.
+
+    Avoids pulling in cachetools for the one behaviour we need: results are
+    retrievable by ID for a while after completion, then dropped so the
+    process does not accumulate every report it has ever produced.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        while self._data:
+            key, (stamp, _) = next(iter(self._data.items()))
+            if stamp >= cutoff:
+                break
+            del self._data[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._expire()
+        self._data[key] = (time.monotonic(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        self._expire()
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        return entry[1]
+
+
+def _track(client_id: str, task: asyncio.Task) -> asyncio.Task:
+    """Register a task against a client and drop it as soon as it finishes."""
+    s = websocket_tasks.setdefault(client_id, set())
+    s.add(task)
+    task.add_done_callback(s.discard)
+    return task
+research_jobs: Dict[str, dict] = {}
+client_jobs: Dict[str, List[str]] = {}
+
+UPLOAD_DIR = "/tmp/uploads"
+
+# Inbound frames may be produced by either encoder; accept both error types.
+_JSON_DECODE_ERRORS = (json.JSONDecodeError, orjson.JSONDecodeError)
+
+
+_DUMPS_OPTS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _dumps(obj) -> bytes:
+    """Encode an outbound frame; sent as a bytes WebSocket message.
+
+    OPT_SERIALIZE_NUMPY keeps ndarrays in agent output on orjson's native
+    path instead of the default=str fallback, which would stringify the
+    whole array.
+    """
+    return orjson.dumps(obj, option=_DUMPS_OPTS, default=str)
+
+
+# Frames whose payload never changes, serialized once at import.
+_INIT_FRAME = _dumps({
+    "type": "research_status",
+    "status": "initializing",
+    "message": "Initializing research agent...",
+})
+_UNSUPPORTED_FRAME = _dumps({
+    "type": "error",
+    "message": "Unsupported message format",
+})
+_PONG_PREFIX = b'{"type":"pong","timestamp":'
+
+
+def _pong_frame() -> bytes:
+    # Timestamp is time.monotonic_ns(): an integer, so no dtoa work on the
+    # serialize side, and clients diff it against their previous pong rather
+    # than against wall-clock time.
+    return _PONG_PREFIX + str(time.monotonic_ns()).encode() + b"}"
+
+
+# Keys checked, in order, when a client sends a bare dict without a type.
+PROMPT_KEYS = ("prompt", "content", "text", "question", "query", "message")
+
+RESEARCH_SYSTEM_PROMPT = (
+    "You are an expert automotive research assistant for a repair shop. "
+    "Produce a detailed, well-structured markdown report for the request, "
+    "covering diagnostic steps, likely causes, repair procedures, parts and "
+    "torque specifications where relevant."
+)
+
+
+@app.on_event("startup")
+async def startup_event():
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    app.state.completed_research = _TTLCache(maxsize=1024, ttl=3600)
+    app.state.completed_analysis = _TTLCache(maxsize=1024, ttl=3600)
+    # CPU-bound research kernels run out-of-process so the event loop stays
+    # responsive to heartbeats while a job is executing.
+    app.state.proc_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+    # EDA jobs run on their own small thread pool so a burst of analyses
+    # cannot exhaust the default executor that other run_in_executor
+    # callers (report writes, etc.) share.
+    app.state.plot_executor = ThreadPoolExecutor(max_workers=4)
+    app.state.mp_manager = multiprocessing.Manager()
+    logger.info("Analysis server started (pid %s)", os.getpid())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.proc_pool.shutdown(wait=False)
+    app.state.plot_executor.shutdown(wait=False)
+    app.state.mp_manager.shutdown()
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "active_connections": len(active_connections)}
+
+
+# Research pipeline ------------------------------------------------------------
+
+def _research_cpu(prompt: str, chunk_queue) -> dict:
+    """CPU kernel for a research job, run inside the process pool.
+
+    Streams content chunks back through chunk_queue (a Manager queue) and
+    returns the finished report. Keeping the tokenization/parsing work out of
+    the server process restores multi-core scaling for concurrent jobs.
+    """
+    from openai import OpenAI
+
+    parts = []
+    try:
+        client = OpenAI()
+        stream = client.chat.completions.create(
+            model=os.getenv("RESEARCH_MODEL", "gpt-4o-mini"),
+            messages=[
+                {"role": "system", "content": RESEARCH_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            stream=True,
+        )
+        for chunk in stream:
+            content = chunk.choices[0].delta.content
+            if content:
+                parts.append(content)
+                chunk_queue.put(content)
+    finally:
+        # Always close the stream, even when the client setup or the API
+        # call raises: run_research awaits the sentinel before it awaits
+        # this future, and the drain thread blocks on the queue until it
+        # sees one.
+        chunk_queue.put(None)
+
+    report = "".join(parts)
+    return {"report": report, "length": len(report)}
+
+
+def _get_live_ws(client_id: str) -> Optional[WebSocket]:
+    """Return the client's WebSocket if it is still connected, else None."""
+    ws = active_connections.get(client_id)
+    if ws is not None and ws.client_state == WebSocketState.CONNECTED:
+        return ws
+    return None
+
+
+async def stream_to_client(client_id: str, frame: dict):
+    """Send one JSON frame to a client if it is still connected."""
+    if (websocket := _get_live_ws(client_id)) is not None:
+        await websocket.send_bytes(_dumps(frame))
+
+
+async def handle_stream(content: str, client_id: str, job_id: str):
+    """Forward one streamed agent chunk to the client and track volume."""
+    job = research_jobs.get(job_id)
+    if job is not None:
+        job["streamed_bytes"] = job.get("streamed_bytes", 0) + len(content)
+        progress_q = job.get("progress_q")
+        if progress_q is not None:
+            progress_q.put_nowait(len(content))
+    await stream_to_client(client_id, {
+        "type": "research_progress",
+        "job_id": job_id,
+        "content": content,
+        "timestamp": time.monotonic_ns(),
+    })
+
+
+async def run_research(prompt: str, client_id: str):
+    """Run a research job: orchestrate IO here, do CPU work in the pool."""
+    job_id = str(uuid.uuid4())
+    research_jobs[job_id] = {
+        "job_id": job_id,
+        "client_id": client_id,
+        "prompt": prompt,
+        "status": "processing",
+        "progress": 0,
+        "started_at": time.time(),
+        "result": None,
+    }
+    client_jobs.setdefault(client_id, []).append(job_id)
+
+    await stream_to_client(client_id, {
+        "type": "research_status",
+        "status": "started",
+        "job_id": job_id,
+        "timestamp": time.monotonic_ns(),
+    })
+
+    loop = asyncio.get_running_loop()
+    chunk_queue = app.state.mp_manager.Queue()
+    stream_q: asyncio.Queue = asyncio.Queue()
+
+    def _drain():
+        # Bridge the Manager queue into the event loop.
+        while True:
+            item = chunk_queue.get()
+            loop.call_soon_threadsafe(stream_q.put_nowait, item)
+            if item is None:
+                break
+
+    drain_thread = threading.Thread(target=_drain, daemon=True)
+    drain_thread.start()
+
+    try:
+        cpu_future = loop.run_in_executor(
+            app.state.proc_pool, _research_cpu, prompt, chunk_queue
+        )
+
+        while True:
+            content = await stream_q.get()
+            if content is None:
+                break
+            await handle_stream(content, client_id, job_id)
+
+        result = await cpu_future
+
+        research_jobs[job_id]["status"] = "completed"
+        research_jobs[job_id]["progress"] = 100
+        research_jobs[job_id]["result"] = result
+        research_jobs[job_id]["completion_time"] = time.time()
+        app.state.completed_research[job_id] = result
+
+        await stream_to_client(client_id, {
+            "type": "research_complete",
+            "job_id": job_id,
+            "report": result["report"],
+            "timestamp": time.monotonic_ns(),
+        })
+    except Exception as e:
+        logger.error("Research job %s failed: %s", job_id, e)
+        research_jobs[job_id]["status"] = "failed"
+        research_jobs[job_id]["error"] = str(e)
+        await stream_to_client(client_id, {
+            "type": "research_error",
+            "job_id": job_id,
+            "message": str(e),
+            "timestamp": time.monotonic_ns(),
+        })
+
+
+# Analysis pipeline ------------------------------------------------------------
+
+# Prompt templates are built once; __FILE__/__OUT__ are substituted per job.
+_PROMPT_BASE = """Analyze the CSV file at __FILE__.
+Save every chart you produce as a PNG file in __OUT__.
+Write a markdown summary of your findings to __OUT__/summary_report.md.
+"""
+_PROMPT_TEMPLATES: Dict[str, str] = {
+    "general": _PROMPT_BASE + """Perform a general statistical analysis of __FILE__
+with summary statistics and the most informative charts saved to __OUT__.
+""",
+    "exploratory": _PROMPT_BASE + """Perform an exploratory analysis of __FILE__:
+distributions of the numeric columns, a correlation heatmap, boxplots,
+pairwise relationships and value counts for categorical columns.
+""",
+    "predictive": _PROMPT_BASE + """Perform a predictive screening of __FILE__:
+identify likely target columns, rank feature correlations against them and
+plot the strongest relationships found in __OUT__.
+""",
+}
+
+
+# Rough work estimate used to map completed bytes onto a 0-95% scale.
+
+
+_ANALYSIS_WORK_ESTIMATE = 1_500_000
+
+
+async def send_progress_updates(client_id: str, job_id: str):
+    """Forward real progress posted on the job's progress queue.
+
+    Consumers of the queue are handle_stream (streamed agent bytes) and
+    send_visualization (rendered chart bytes); a None sentinel closes it.
+    Frames are only emitted when integer progress actually advances, so an
+    idle job sends nothing instead of a timer-driven no-op every 2s.
+    """
+    job = research_jobs.get(job_id)
+    if job is None:
+        return
+    progress_q: asyncio.Queue = job["progress_q"]
+    done = 0
+    last_sent = 0
+    while True:
+        increment = await progress_q.get()
+        if increment is None:
+            break
+        done += increment
+        progress = min(done * 100 // _ANALYSIS_WORK_ESTIMATE, 95)
+        if progress <= job.get("progress", 0) or progress - last_sent < 1:
+            continue
+        job["progress"] = progress
+        if (websocket := _get_live_ws(client_id)) is not None:
+            await websocket.send_bytes(_dumps({
+                "type": "analysis_progress",
+                "job_id": job_id,
+                "progress": progress,
+                "timestamp": time.monotonic_ns(),
+            }))
+            last_sent = progress
+
+
+async def watch_for_visualizations(output_dir: Path, client_id: str, job_id: str):
+    """Push new charts from the job output directory to the client.
+
+    Uses inotify/FSEvents via watchfiles when available (no syscalls while
+    idle, sub-100ms delivery); otherwise falls back to 1s polling.
+    """
+    if _HAS_WATCHFILES:
+        await _watch_with_events(output_dir, client_id, job_id)
+    else:
+        await _watch_with_polling(output_dir, client_id, job_id)
+
+
+async def _watch_with_events(output_dir: Path, client_id: str, job_id: str):
+    stop_event = research_jobs.get(job_id, {}).get("done_event")
+    async for changes in awatch(
+        output_dir,
+        watch_filter=lambda change, path: path.endswith(".png"),
+        stop_event=stop_event,
+    ):
+        for change_type, path in changes:
+            if change_type == Change.added:
+                await send_visualization(path, client_id, job_id)
+
+
+async def _watch_with_polling(output_dir: Path, client_id: str, job_id: str):
+    known_files: Set[str] = set()
+    while True:
+        job = research_jobs.get(job_id)
+        running = bool(job and job["status"] == "processing")
+        try:
+            # scandir hands back DirEntry objects with cached stat data, so
+            # the filter costs no extra syscalls per tick.
+            with os.scandir(output_dir) as it:
+                for entry in it:
+                    if (entry.name.endswith(".png")
+                            and entry.name not in known_files
+                            and entry.is_file()):
+                        known_files.add(entry.name)
+                        await send_visualization(entry.path, client_id, job_id)
+        except FileNotFoundError:
+            pass
+        if not running:
+            # The status flip was observed before this scan, so anything
+            # written just before completion has now been picked up.
+            break
+        await asyncio.sleep(1)
+
+
+_VIZ_CHUNK = 64 * 1024
+
+
+async def send_visualization(file_path: str, client_id: str, job_id: str):
+    """Send one generated chart: a metadata frame, then the raw image bytes.
+
+    Binary frames avoid the 33% base64 inflation and the double buffer copy
+    of encoding the PNG into a JSON envelope. Each file is sent at most
+    once per job, so the watcher and the final completion sweep can both
+    call this without duplicating frames.
+    """
+    job = research_jobs.get(job_id)
+    if job is not None:
+        sent = job.setdefault("sent_viz", set())
+        name = os.path.basename(file_path)
+        if name in sent:
+            return
+        sent.add(name)
+    viz_id = str(uuid.uuid4())
+    async with aiofiles.open(file_path, "rb") as img_file:
+        img_bytes = await img_file.read()
+    if job is not None:
+        progress_q = job.get("progress_q")
+        if progress_q is not None:
+            progress_q.put_nowait(len(img_bytes))
+    if (websocket := _get_live_ws(client_id)) is not None:
+        await websocket.send_bytes(_dumps({
+            "type": "visualization_meta",
+            "viz_id": viz_id,
+            "job_id": job_id,
+            "filename": os.path.basename(file_path),
+            "size": len(img_bytes),
+            "timestamp": time.monotonic_ns(),
+        }))
+        # Large images go out as consecutive 64 KiB frames so one chart
+        # cannot monopolise the connection; the meta frame carries the
+        # total size the client needs to reassemble them.
+        view = memoryview(img_bytes)
+        for offset in range(0, len(view), _VIZ_CHUNK):
+            await websocket.send_bytes(view[offset:offset + _VIZ_CHUNK])
+
+
+async def _run_analysis_agent(analysis_prompt: str, preview_json: str) -> Optional[str]:
+    """Ask the analysis agent for a bespoke analysis script."""
+    from openai import AsyncOpenAI
+
+    client = AsyncOpenAI()
+    completion = await client.chat.completions.create(
+        model=os.getenv("ANALYSIS_MODEL", "gpt-4o-mini"),
+        messages=[
+            {"role": "system", "content": (
+                "You are a data analysis agent. Reply with a single Python "
+                "code block that performs the requested analysis."
+            )},
+            {"role": "user", "content": analysis_prompt + "\n\nData preview:\n" + preview_json},
+        ],
+    )
+    return completion.choices[0].message.content
+
+
+async def run_analysis(file_path: str, analysis_type: str, options: dict, client_id: str):
+    """Run an EDA job over an uploaded CSV and stream results back."""
+    job_id = str(uuid.uuid4())
+    research_jobs[job_id] = {
+        "job_id": job_id,
+        "client_id": client_id,
+        "file_path": file_path,
+        "analysis_type": analysis_type,
+        "status": "processing",
+        "progress": 0,
+        "started_at": time.time(),
+        "done_event": asyncio.Event(),
+        "progress_q": asyncio.Queue(),
+    }
+    client_jobs.setdefault(client_id, []).append(job_id)
+
+    if not _DA_AVAILABLE:
+        research_jobs[job_id]["status"] = "failed"
+        research_jobs[job_id]["done_event"].set()
+        research_jobs[job_id]["progress_q"].put_nowait(None)
+        if (websocket := _get_live_ws(client_id)) is not None:
+            await websocket.send_bytes(_dumps({
+                "type": "analysis_error",
+                "job_id": job_id,
+                "message": f"Data analysis libraries not installed: {_DA_ERROR}",
+                "timestamp": time.monotonic_ns(),
+            }))
+        return
+
+    out = Path("/tmp/output") / job_id
+    out.mkdir(parents=True, exist_ok=True)
+    output_dir = str(out)
+
+    tmpl = _PROMPT_TEMPLATES.get(analysis_type, _PROMPT_TEMPLATES["general"])
+    analysis_prompt = tmpl.replace("__FILE__", file_path).replace("__OUT__", output_dir)
+
+    option_text = ""
+    for key, value in options.items():
+        option_text += f"- {key}: {value}\n"
+    if option_text:
+        analysis_prompt = analysis_prompt + "\nOptions:\n" + option_text
+
+    # Structured concurrency: the group owns the progress/viz helpers, so
+    # they are awaited (or cancelled) when this coroutine exits even when the
+    # caller is the REST endpoint rather than a WebSocket handler.
+    async with asyncio.TaskGroup() as tg:
+        progress_task = _track(client_id, tg.create_task(send_progress_updates(client_id, job_id)))
+        viz_task = _track(client_id, tg.create_task(watch_for_visualizations(out, client_id, job_id)))
+        try:
+            loop = asyncio.get_running_loop()
+            responses = None
+            script_output = ""
+            entries = None
+            try:
+                # Common case: the EDA is fixed, so run it as a direct call
+                # on a worker thread -- no agent round-trip, no generated
+                # script, no subprocess. Each finished chart posts its
+                # encoded size onto the progress queue from the worker
+                # thread, which is what send_progress_updates consumes.
+                progress_q = research_jobs[job_id]["progress_q"]
+
+                def _post_progress(nbytes, _put=progress_q.put_nowait):
+                    loop.call_soon_threadsafe(_put, nbytes)
+
+                entries = await loop.run_in_executor(
+                    app.state.plot_executor, perform_eda,
+                    file_path, output_dir, options.get("derive"), _post_progress,
+                )
+            except Exception as eda_error:
+                logger.warning("In-process EDA failed, falling back to the analysis agent: %s", eda_error)
+                if not os.getenv("OPENAI_API_KEY"):
+                    raise
+                preview_df = _pd.read_csv(file_path, nrows=20)
+                preview_json = orjson.dumps(
+                    preview_df.to_dict(orient="list"),
+                    option=_DUMPS_OPTS,
+                    default=str,
+                ).decode()
+                responses = await _run_analysis_agent(analysis_prompt, preview_json)
+                if not responses or "```python" not in responses:
+                    raise RuntimeError("Analysis agent returned no script")
+                analysis_script = responses.split("```python", 1)[1].split("```", 1)[0]
+
+                script_path = os.path.join(output_dir, "analysis_script.py")
+                with open(script_path, "w", encoding="utf-8") as f:
+                    f.write(analysis_script)
+
+                # Async subprocess, same as the dependency installer: a
+                # blocking subprocess.run here would stall every WebSocket
+                # and heartbeat for the lifetime of the script.
+                proc = await asyncio.create_subprocess_exec(
+                    sys.executable, script_path, file_path, output_dir,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+                try:
+                    stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=600)
+                except asyncio.TimeoutError:
+                    proc.kill()
+                    await proc.wait()
+                    raise RuntimeError("Analysis script timed out after 600s")
+                if proc.returncode != 0:
+                    raise RuntimeError(
+                        "Analysis script failed: "
+                        + stderr.decode("utf-8", errors="replace")[-2000:]
+                    )
+                script_output = stdout.decode("utf-8", errors="replace")
+
+            # The chart writes land in one batch at the very end of the
+            # job, inside the watchers' blind spot (the polling tick or
+            # awatch's pending batch). One sweep here, before the status
+            # flips, guarantees every chart is streamed;
+            # send_visualization skips files a watcher already pushed.
+            try:
+                with os.scandir(output_dir) as it:
+                    for dir_entry in it:
+                        if dir_entry.name.endswith(".png") and dir_entry.is_file():
+                            await send_visualization(dir_entry.path, client_id, job_id)
+            except FileNotFoundError:
+                pass
+
+            response_text = "# Analysis Results\n\n"
+            if responses:
+                response_text += responses + "\n\n"
+            if script_output:
+                response_text += "## Script output\n\n```\n" + script_output + "\n```\n"
+
+            if entries is not None:
+                visualizations = [
+                    {**entry, "url": f"/visualizations/{job_id}/{entry['filename']}"}
+                    for entry in entries
+                ]
+                try:
+                    async with aiofiles.open(
+                        os.path.join(output_dir, "summary_report.md"), "r", encoding="utf-8"
+                    ) as f:
+                        response_text += await f.read()
+                except OSError:
+                    pass
+            else:
+                visualizations = []
+                with os.scandir(output_dir) as it:
+                    for entry in it:
+                        if entry.name.endswith(".png"):
+                            visualizations.append({
+                                "filename": entry.name,
+                                "description": entry.name.rsplit(".", 1)[0].replace("_", " "),
+                                "url": f"/visualizations/{job_id}/{entry.name}",
+                            })
+
+            report_file = os.path.join(output_dir, "report.md")
+            # Encode once and write with a single syscall; text-mode writes
+            # would push the report through TextIOWrapper in 8 KiB chunks.
+            report_bytes = response_text.encode("utf-8")
+
+            def _write_report():
+                fd = os.open(report_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                try:
+                    os.write(fd, report_bytes)
+                finally:
+                    os.close(fd)
+
+            await loop.run_in_executor(None, _write_report)
+
+            research_jobs[job_id]["status"] = "completed"
+            research_jobs[job_id]["progress"] = 100
+            research_jobs[job_id]["completion_time"] = time.time()
+            research_jobs[job_id]["done_event"].set()
+            research_jobs[job_id]["progress_q"].put_nowait(None)
+            app.state.completed_analysis[job_id] = {
+                "job_id": job_id,
+                "report": response_text,
+                "visualizations": visualizations,
+                "output_dir": output_dir,
+            }
+
+            if (websocket := _get_live_ws(client_id)) is not None:
+                await websocket.send_bytes(_dumps({
+                    "type": "analysis_complete",
+                    "job_id": job_id,
+                    "report": response_text,
+                    "timestamp": time.monotonic_ns(),
+                }))
+                # The viz array is serialized once and spliced into the
+                # frame, same as the cached summaries in list_jobs.
+                viz_bytes = orjson.dumps(visualizations, option=_DUMPS_OPTS, default=str)
+                await websocket.send_bytes(
+                    b'{"type":"visualizations_ready","job_id":"' + job_id.encode()
+                    + b'","visualizations":' + viz_bytes
+                    + b',"timestamp":' + str(time.monotonic_ns()).encode() + b'}'
+                )
+
+        except Exception as e:
+            logger.error("Analysis job %s failed: %s", job_id, e)
+            research_jobs[job_id]["status"] = "failed"
+            research_jobs[job_id]["error"] = str(e)
+            research_jobs[job_id]["done_event"].set()
+            research_jobs[job_id]["progress_q"].put_nowait(None)
+            if (websocket := _get_live_ws(client_id)) is not None:
+                await websocket.send_bytes(_dumps({
+                    "type": "analysis_error",
+                    "job_id": job_id,
+                    "message": str(e),
+                    "timestamp": time.monotonic_ns(),
+                }))
+        finally:
+            progress_task.cancel()
+            viz_task.cancel()
+
+
+# WebSocket endpoints ----------------------------------------------------------
+
+def _job_summary(job_id: str, job: dict) -> dict:
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "progress": job.get("progress", 0),
+        "prompt": (job.get("prompt") or job.get("file_path") or "")[:100],
+        "started_at": job.get("started_at"),
+        "completion_time": job.get("completion_time"),
+    }
+
+
+def _finished_summary_bytes(job_id: str, job: dict) -> bytes:
+    """Pre-encoded summary for a finished job; cached since it never changes."""
+    cached = job.get("summary_bytes")
+    if cached is None:
+        cached = orjson.dumps(_job_summary(job_id, job))
+        job["summary_bytes"] = cached
+    return cached
+
+
+def _extract_prompt(message: dict) -> str:
+    """Pull the research prompt out of an untyped message dict."""
+    return next(
+        (v for k in PROMPT_KEYS
+         if isinstance(v := message.get(k), str) and len(v) > 5),
+        "",
+    )
+
+
+async def list_jobs(client_id: str, websocket: WebSocket):
+    """Send the client a summary of its active and completed jobs."""
+    active_jobs = []
+    completed_chunks = []
+    for job_id in client_jobs.get(client_id, []):
+        job = research_jobs.get(job_id)
+        if not job:
+            continue
+        if job["status"] == "processing":
+            active_jobs.append(_job_summary(job_id, job))
+        else:
+            completed_chunks.append(_finished_summary_bytes(job_id, job))
+    # Splice the cached per-job bytes in directly so unchanged records are
+    # never re-serialized.
+    payload = (
+        b'{"type":"job_list","active_jobs":' + orjson.dumps(active_jobs)
+        + b',"completed_jobs":[' + b",".join(completed_chunks) + b']}'
+    )
+    await websocket.send_bytes(payload)
+
+
+async def _handle_research_request(message: dict, client_id: str, websocket: WebSocket):
+    prompt = message.get("prompt") or _extract_prompt(message)
+    if not prompt:
+        await websocket.send_bytes(_UNSUPPORTED_FRAME)
+        return
+    await websocket.send_bytes(_INIT_FRAME)
+    _track(client_id, asyncio.create_task(run_research(prompt, client_id)))
+
+
+async def _handle_analysis_request(message: dict, client_id: str, websocket: WebSocket):
+    file_path = message.get("file_path", "")
+    # Single stat probe instead of exists()+open: one syscall, no window
+    # for the file to disappear between check and use. run_analysis still
+    # converts a vanished file into an error frame.
+    try:
+        os.stat(file_path)
+    except OSError:
+        await websocket.send_bytes(_dumps({
+            "type": "error",
+            "message": f"File not found: {file_path}",
+        }))
+        return
+    task = asyncio.create_task(run_analysis(
+        file_path,
+        message.get("analysis_type", "general"),
+        message.get("options", {}),
+        client_id,
+    ))
+    _track(client_id, task)
+
+
+async def _handle_ping(message: dict, client_id: str, websocket: WebSocket):
+    await websocket.send_bytes(_pong_frame())
+
+
+async def _handle_list_jobs(message: dict, client_id: str, websocket: WebSocket):
+    await list_jobs(client_id, websocket)
+
+
+async def _handle_unknown(message: dict, client_id: str, websocket: WebSocket):
+    await websocket.send_bytes(_UNSUPPORTED_FRAME)
+
+
+_HANDLERS: Dict[str, Callable[[dict, str, WebSocket], Awaitable[None]]] = {
+    "research_request": _handle_research_request,
+    "analysis_request": _handle_analysis_request,
+    "ping": _handle_ping,
+    "list_jobs": _handle_list_jobs,
+}
+
+
+async def _handle_messages(websocket: WebSocket, client_id: str):
+    """Shared receive loop for both WebSocket endpoints."""
+    # Startup notice: surface results that completed while the client was away.
+    completed = [
+        job_id for job_id in client_jobs.get(client_id, [])
+        if research_jobs.get(job_id, {}).get("status") == "completed"
+    ]
+    if completed:
+        payload = (
+            b'{"type":"completed_jobs","jobs":['
+            + b",".join(
+                _finished_summary_bytes(job_id, research_jobs[job_id])
+                for job_id in completed
+            )
+            + b']}'
+        )
+        await websocket.send_bytes(payload)
+
+    while True:
+        data = await websocket.receive_text()
+        try:
+            if _sj_parser is not None:
+                # Reused parser instance: one structural SIMD scan per frame.
+                doc = None
+                try:
+                    doc = _sj_parser.parse(
+                        data if isinstance(data, (bytes, bytearray)) else data.encode()
+                    )
+                    if isinstance(doc, simdjson.Object):
+                        if "ping" in doc:
+                            # Heartbeat fast path: reply without materializing
+                            # the document into a dict at all.
+                            await websocket.send_bytes(_pong_frame())
+                            continue
+                        message = doc.as_dict()
+                    else:
+                        # Anything that is not a JSON object (scalar, array,
+                        # unparseable text) goes down the raw-string path.
+                        message = data
+                except ValueError:
+                    message = data
+                except RuntimeError:
+                    # The parser refuses to run while a proxy from an
+                    # earlier frame is alive; this frame may still be valid
+                    # JSON, so decode it with orjson rather than dropping it.
+                    try:
+                        message = orjson.loads(data)
+                    except _JSON_DECODE_ERRORS:
+                        message = data
+                finally:
+                    # Release the document proxy before the next frame's
+                    # parse; pysimdjson refuses to re-use the parser while
+                    # one is still live.
+                    del doc
+            else:
+                try:
+                    message = orjson.loads(data)
+                except _JSON_DECODE_ERRORS:
+                    message = data
+
+            # Normalize to a dict, then dispatch on the message type.
+            if isinstance(message, str):
+                message = {"type": "research_request", "prompt": message}
+            if not isinstance(message, dict):
+                await websocket.send_bytes(_UNSUPPORTED_FRAME)
+                continue
+            msg_type = message.get("type") or (
+                "ping" if "ping" in message else "research_request"
+            )
+            handler = _HANDLERS.get(msg_type, _handle_unknown)
+            await handler(message, client_id, websocket)
+        except (KeyError, TypeError, AttributeError, ValueError) as e:
+            # Malformed client input: report it without walking the stack.
+            logger.warning("Bad message from %s: %s", client_id, e)
+            await websocket.send_bytes(_dumps({
+                "type": "error",
+                "message": str(e),
+            }))
+        except Exception as e:
+            logger.error("Error handling message from %s: %s", client_id, e)
+            frame = {"type": "error", "message": str(e)}
+            if logger.isEnabledFor(logging.DEBUG):
+                frame["traceback"] = traceback.format_exc()
+            await websocket.send_bytes(_dumps(frame))
+
+
+@app.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket, client_id: str = Query(...)):
+    await websocket.accept()
+    active_connections[client_id] = websocket
+    websocket_tasks.setdefault(client_id, set())
+    try:
+        await _handle_messages(websocket, client_id)
+    except WebSocketDisconnect:
+        logger.info("Client %s disconnected", client_id)
+    finally:
+        # active_connections holds weak values, so the entry goes away with
+        # the socket; only the task set needs explicit teardown.
+        # Snapshot-and-pop so a reconnect reusing this client_id cannot race
+        # with the teardown, then join the cancellations instead of leaving
+        # them pending on the loop.
+        tasks = websocket_tasks.pop(client_id, set())
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        if tasks:
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*tasks, return_exceptions=True), timeout=5.0
+                )
+            except asyncio.TimeoutError:
+                logger.warning("Timed out cancelling tasks for %s", client_id)
+
+
+@app.websocket("/research-ws")
+async def research_websocket_endpoint(websocket: WebSocket, client_id: str = Query(...)):
+    await websocket.accept()
+    active_connections[client_id] = websocket
+    websocket_tasks.setdefault(client_id, set())
+    try:
+        await _handle_messages(websocket, client_id)
+    except WebSocketDisconnect:
+        logger.info("Research client %s disconnected", client_id)
+    finally:
+        # active_connections holds weak values, so the entry goes away with
+        # the socket; only the task set needs explicit teardown.
+        # Snapshot-and-pop so a reconnect reusing this client_id cannot race
+        # with the teardown, then join the cancellations instead of leaving
+        # them pending on the loop.
+        tasks = websocket_tasks.pop(client_id, set())
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        if tasks:
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*tasks, return_exceptions=True), timeout=5.0
+                )
+            except asyncio.TimeoutError:
+                logger.warning("Timed out cancelling tasks for %s", client_id)
+
+
+# REST endpoints ---------------------------------------------------------------
+
+_UPLOAD_CHUNK = 4 * 1024 * 1024
+
+
+async def _save_upload(file: UploadFile, file_path: str) -> None:
+    """Stream an upload to disk without blocking the event loop."""
+    async with aiofiles.open(file_path, "wb") as buffer:
+        if file.size and hasattr(os, "posix_fallocate"):
+            # Reserve the extents up front so a large CSV lands contiguously
+            # instead of growing the file one chunk at a time.
+            try:
+                os.posix_fallocate(buffer.fileno(), 0, file.size)
+            except Exception:
+                # Preallocation is best-effort; never fail the upload over it.
+                pass
+        while chunk := await file.read(_UPLOAD_CHUNK):
+            await buffer.write(chunk)
+
+
+@app.post("/upload")
+async def upload_file(file: UploadFile = File(...)):
+    file_path = os.path.join(UPLOAD_DIR, file.filename)
+    await _save_upload(file, file_path)
+    return {"success": True, "file_path": file_path, "filename": file.filename}
+
+
+@app.post("/analysis")
+async def create_analysis(
+    file: UploadFile = File(...),
+    analysis_type: str = Form("general"),
+    client_id: Optional[str] = Form(None),
+):
+    file_path = os.path.join(UPLOAD_DIR, file.filename)
+    await _save_upload(file, file_path)
+
+    # _track holds a strong reference until the job finishes; a bare
+    # create_task leaves only the loop's weak ref and the running job can
+    # be garbage-collected mid-flight.
+    _track(client_id or "", asyncio.create_task(
+        run_analysis(file_path, analysis_type, {}, client_id or "")
+    ))
+    return {"success": True, "file_path": file_path}
+
+
+@app.get("/analysis/{result_id}")
+async def get_analysis(result_id: str):
+    result = app.state.completed_analysis.get(result_id)
+    if result is None:
+        return JSONResponse(status_code=404, content={"error": "Result not found"})
+    return result
+
+
+@app.get("/research/results/{job_id}")
+async def get_research_results(job_id: str):
+    result = app.state.completed_research.get(job_id)
+    if result is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    return result
+
+
+@app.get("/visualizations/{job_id}/{filename}")
+async def get_visualization(job_id: str, filename: str, request: Request):
+    file_path = os.path.join("/tmp/output", job_id, os.path.basename(filename))
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return JSONResponse(status_code=404, content={"error": "Visualization not found"})
+    # Charts are written once per job, so they can be cached forever; the
+    # ETag keys on mtime+size and lets reloads short-circuit to a 304
+    # before any file I/O happens.
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    headers = {
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "ETag": etag,
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(file_path, media_type="image/png", headers=headers)
+
+
+@app.post("/install-data-analysis-deps")
+async def install_data_analysis_deps():
+    # pip can run for tens of seconds; an async subprocess keeps the event
+    # loop serving other requests for the duration.
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "pip", "install",
+        "pandas", "numpy", "matplotlib", "seaborn",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+    )
+    stdout, _ = await proc.communicate()
+    return {
+        "success": proc.returncode == 0,
+        "output": stdout.decode(errors="replace")[-4000:],
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8000)
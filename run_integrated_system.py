@@ -0,0 +1,65 @@
+"""Supervisor for the integrated system.
+
+Starts the Python analysis server and the Node backend together, restarts
+nothing, and tears the whole stack down when any child exits or the user
+hits Ctrl+C. Run from the repo root: python run_integrated_system.py
+"""
+
+import os
+import signal
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+COMMANDS = {
+    "analysis-server": [sys.executable, os.path.join(BASE_DIR, "robust_server.py")],
+    "backend": ["node", os.path.join(BASE_DIR, "server.js")],
+}
+
+
+def start_processes():
+    processes = {}
+    for name, cmd in COMMANDS.items():
+        print(f"[INFO] Starting {name}: {' '.join(cmd)}")
+        processes[name] = subprocess.Popen(cmd, cwd=BASE_DIR)
+    return processes
+
+
+def stop_processes(processes):
+    for name, proc in processes.items():
+        if proc.poll() is None:
+            print(f"[INFO] Stopping {name} (pid {proc.pid})")
+            proc.terminate()
+    for name, proc in processes.items():
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            print(f"[ERROR] {name} did not exit, killing")
+            proc.kill()
+            proc.wait()
+
+
+def main():
+    processes = start_processes()
+    try:
+        # Block in the kernel until any child changes state instead of
+        # polling each Popen every second: zero wakeups while the stack is
+        # healthy, and an unexpected death is seen immediately. WNOWAIT
+        # leaves the child reapable so Popen.wait() in stop_processes still
+        # collects its status.
+        info = os.waitid(os.P_ALL, 0, os.WEXITED | os.WNOWAIT)
+        for name, proc in processes.items():
+            if proc.pid == info.si_pid:
+                print(f"[ERROR] {name} exited (pid {info.si_pid}, "
+                      f"status {info.si_status}); shutting down the stack")
+                break
+    except KeyboardInterrupt:
+        print("[INFO] Interrupted, shutting down")
+    finally:
+        stop_processes(processes)
+
+
+if __name__ == "__main__":
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    main()
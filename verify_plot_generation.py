@@ -0,0 +1,244 @@
+"""Verify chart generation for the OBD2 analysis pipeline.
+
+Renders the same kinds of figures the analysis server produces (time
+series, correlation heatmap, boxplots) from synthetic OBD2 data and
+checks the PNGs actually land on disk. Run standalone:
+python verify_plot_generation.py; results go to
+/tmp/plot_verification_results.json.
+"""
+
+import argparse
+import functools
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import seaborn as sns
+
+from obd2_analysis import PLOT_FORMAT, SAVE_KW, corr_stats, write_batch
+
+OBD2_COLS = ['rpm', 'speed', 'engineTemp', 'throttlePosition', 'engineLoad']
+N_SAMPLES = 500
+
+# Encode settings (dpi, format, encoder options) come from obd2_analysis
+# so the verification artifacts match what production emits. Margins come
+# from the figures' constrained layout engine; bbox_inches='tight' would
+# rasterize each figure twice just to measure it.
+
+
+def fast_corr(df, cols):
+    """Correlation as one BLAS GEMM over the standardized column block.
+
+    DataFrame.corr walks column pairs in Python; z-scoring the (N, k)
+    array once and multiplying X.T @ X does the whole matrix in a single
+    dgemm call.
+    """
+    corr, _means, _stds = corr_stats(df[cols].to_numpy(np.float64))
+    return pd.DataFrame(corr, index=cols, columns=cols)
+
+
+@functools.lru_cache(maxsize=1)
+def _make_obd2_df():
+    """Synthetic OBD2 session plus its correlation matrix, built once.
+
+    Both the plot test and the production-code check consume the same
+    fixture, so the DataFrame allocation and the corr() pass happen a
+    single time per run.
+    """
+    # One (5, N) draw through PCG64 (about twice as fast as the legacy
+    # Mersenne Twister), then shift/scale every channel in one broadcast.
+    rng = np.random.default_rng(42)
+    means = np.array([[2500.0], [55.0], [90.0], [35.0], [45.0]])
+    scales = np.array([[200.0], [5.0], [3.0], [10.0], [8.0]])
+    samples = rng.standard_normal((5, N_SAMPLES)) * scales + means
+    df = pd.DataFrame(dict(zip(OBD2_COLS, samples)))
+    return df, fast_corr(df, OBD2_COLS)
+
+
+def _check(path):
+    ok = os.path.isfile(path) and os.path.getsize(path) > 0
+    print(f"[{'INFO' if ok else 'ERROR'}] {path}: {'ok' if ok else 'missing or empty'}")
+    return ok
+
+
+def test_basic_plot(smoke=False):
+    """Smoke test: one line plot through the Agg backend."""
+    if smoke:
+        plt.figure()
+        plt.close()
+        return True
+    plt.figure(figsize=(8, 6), layout='constrained')
+    x = np.linspace(0, 10, 200)
+    plt.plot(x, np.sin(x), label='sin(x)')
+    plt.legend()
+    plt.title("Basic Plot Verification")
+    buf = io.BytesIO()
+    plt.savefig(buf, format=PLOT_FORMAT, **SAVE_KW)
+    plt.close()
+    write_batch([(f'/tmp/test_basic_plot.{PLOT_FORMAT}', buf.getvalue())])
+    return _check(f'/tmp/test_basic_plot.{PLOT_FORMAT}')
+
+
+def test_obd2_analysis_plots(smoke=False):
+    """The three chart types the analysis server emits for OBD2 sessions."""
+    if smoke:
+        plt.figure()
+        plt.close()
+        return True
+    df, corr_df = _make_obd2_df()
+
+    # One Figure serves all three charts: clf() between renders reuses the
+    # canvas and transform stack instead of allocating them per chart.
+    fig = plt.figure(figsize=(12, 8), layout='constrained')
+
+    for i, col in enumerate(['rpm', 'speed', 'engineTemp'], start=1):
+        ax = fig.add_subplot(3, 1, i)
+        ax.plot(df.index, df[col])
+        ax.set_ylabel(col)
+    fig.suptitle("OBD2 Time Series")
+    pending = []
+    buf = io.BytesIO()
+    fig.savefig(buf, format=PLOT_FORMAT, **SAVE_KW)
+    pending.append((f'/tmp/obd2_timeseries.{PLOT_FORMAT}', buf.getvalue()))
+
+    fig.clf()
+    fig.set_size_inches(10, 8)
+    ax = fig.add_subplot(1, 1, 1)
+    # imshow writes the cells as one raster; seaborn's heatmap rebuilds a
+    # QuadMesh and places its annotations through a much thicker path.
+    corr_mat = corr_df.to_numpy()
+    im = ax.imshow(corr_mat, cmap='coolwarm', vmin=-1, vmax=1)
+    ax.set_xticks(range(len(OBD2_COLS)), OBD2_COLS, rotation=45)
+    ax.set_yticks(range(len(OBD2_COLS)), OBD2_COLS)
+    for i in range(corr_mat.shape[0]):
+        for j in range(corr_mat.shape[1]):
+            ax.text(j, i, f'{corr_mat[i, j]:.2f}', ha='center', va='center')
+    fig.colorbar(im, shrink=0.8)
+    ax.set_title("OBD2 Parameter Correlation")
+    buf = io.BytesIO()
+    fig.savefig(buf, format=PLOT_FORMAT, **SAVE_KW)
+    pending.append((f'/tmp/obd2_correlation.{PLOT_FORMAT}', buf.getvalue()))
+
+    fig.clf()
+    fig.set_size_inches(12, 6)
+    ax = fig.add_subplot(1, 1, 1)
+    # Scale the narrow-range parameters up so all five boxes share an
+    # axis: one broadcasted multiply over the (N, 5) block instead of five
+    # per-Series pandas ops.
+    scales = np.array([1, 50, 10, 50, 30], dtype=np.float32)
+    box_mat = df[OBD2_COLS].to_numpy(np.float32) * scales
+    ax.boxplot(box_mat, tick_labels=OBD2_COLS)
+    ax.tick_params(axis='x', rotation=45)
+    ax.set_title("OBD2 Parameter Distributions (scaled)")
+    buf = io.BytesIO()
+    fig.savefig(buf, format=PLOT_FORMAT, **SAVE_KW)
+    pending.append((f'/tmp/obd2_boxplots.{PLOT_FORMAT}', buf.getvalue()))
+    plt.close(fig)
+
+    # All three files go to disk in one batch (a single io_uring_enter
+    # when liburing is available).
+    write_batch(pending)
+
+    return all(_check(p) for p in (
+        f'/tmp/obd2_timeseries.{PLOT_FORMAT}',
+        f'/tmp/obd2_correlation.{PLOT_FORMAT}',
+        f'/tmp/obd2_boxplots.{PLOT_FORMAT}',
+    ))
+
+
+def verify_plot_in_python_execution(smoke=False):
+    """Run the production chart module the way the executor service does.
+
+    The chart source used to live here as a string and was compiled by
+    exec() on every run; importing obd2_analysis instead means CPython
+    compiles it once and reuses the cached bytecode from __pycache__ on
+    every later run.
+    """
+    from obd2_analysis import generate_all_charts
+
+    if smoke:
+        # Importing the module is the whole check: backend selected, chart
+        # code compiles. No rendering.
+        return True
+
+    df, _corr_df = _make_obd2_df()
+    # One contiguous (10, 5) float32 block in COLS order, the layout
+    # generate_all_charts indexes by column.
+    session_data = np.ascontiguousarray(df[OBD2_COLS].head(10).to_numpy(np.float32))
+
+    if os.environ.get('EMIT_TEMPLATE'):
+        # Reference copy of the chart source for debugging only; the charts
+        # themselves come from the imported (bytecode-cached) module.
+        import inspect
+        import obd2_analysis
+        with open('/tmp/obd2_analysis_code.py', 'w', encoding='utf-8') as f:
+            f.write(inspect.getsource(obd2_analysis))
+
+    paths = generate_all_charts(session_data)
+    return all(_check(p) for p in paths)
+
+
+def _warm_matplotlib():
+    """Pay matplotlib's lazy-init costs once, before the checks run.
+
+    The first figure in a fresh process triggers the font-manager scan and
+    seaborn's style setup. Warming in the parent before the pool forks
+    means every worker inherits the hot caches instead of each paying the
+    first-figure tax.
+    """
+    from matplotlib import font_manager
+    font_manager.fontManager.findfont('DejaVu Sans')
+    sns.set_theme()
+    plt.figure()
+    plt.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--smoke', action='store_true',
+        help="only validate imports and backend setup; skip rendering PNGs",
+    )
+    args = parser.parse_args()
+
+    _warm_matplotlib()
+    # The three checks are independent and Agg rasterization is CPU-bound
+    # (and mostly GIL-holding), so they run in separate processes.
+    checks = {
+        'basic_plot': test_basic_plot,
+        'obd2_analysis_plots': test_obd2_analysis_plots,
+        'python_execution': verify_plot_in_python_execution,
+    }
+    results = {}
+    with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, 4)) as pool:
+        futures = {pool.submit(func, args.smoke): name for name, func in checks.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                print(f"[ERROR] {name} failed: {e}")
+                results[name] = False
+
+    summary = {'results': results, 'all_passed': all(results.values())}
+    try:
+        import orjson
+        blob = orjson.dumps(summary, option=orjson.OPT_INDENT_2)
+    except ImportError:
+        blob = json.dumps(summary, indent=2).encode()
+    with open('/tmp/plot_verification_results.json', 'wb') as f:
+        f.write(blob)
+    print(f"[INFO] {'All' if summary['all_passed'] else 'Some'} checks "
+          f"{'passed' if summary['all_passed'] else 'FAILED'}; "
+          f"results in /tmp/plot_verification_results.json")
+    return 0 if summary['all_passed'] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())